@@ -1,6 +1,7 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from config import Config
 
 db = SQLAlchemy()
@@ -9,6 +10,10 @@ def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
     
+    # Behind a proxy every client would share the proxy's address and rate limit bucket
+    if app.config['PROXY_FIX_X_FOR']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
+    
     # Initialize extensions
     db.init_app(app)
     
@@ -16,8 +21,13 @@ def create_app(config_class=Config):
     CORS(app, resources={r"/api/*": {"origins": ["http://localhost:3000"]}})
     
     # Register blueprints
-    from app.routes import api
+    from app.routes import api, admission
     app.register_blueprint(api, url_prefix='/api')
+    admission.init_app(app)
+    
+    # Register CLI commands
+    from app.cli import snapshot_cli
+    app.cli.add_command(snapshot_cli)
     
     # Create database tables
     with app.app_context():
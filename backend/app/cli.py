@@ -0,0 +1,26 @@
+import click
+from flask.cli import AppGroup
+from app.services.snapshot_service import SnapshotService
+
+snapshot_cli = AppGroup('snapshot', help='Export and import cached content snapshots.')
+
+@snapshot_cli.command('export')
+@click.argument('path')
+def export_snapshot(path):
+    """Write all cached topics, diagrams and explanations to PATH (.jsonl.gz)."""
+    counts = SnapshotService().export_snapshot(path)
+    for table, count in counts.items():
+        click.echo(f"Exported {count} rows from {table}")
+
+@snapshot_cli.command('import')
+@click.argument('path')
+@click.option('--replace', is_flag=True, help='Delete existing rows before loading.')
+@click.option('--keep-expiry', is_flag=True, help='Keep exported cache expiry times instead of renewing them.')
+def import_snapshot(path, replace, keep_expiry):
+    """Bulk load a snapshot written by `flask snapshot export`."""
+    try:
+        counts = SnapshotService().import_snapshot(path, replace=replace, keep_expiry=keep_expiry)
+    except (ValueError, OSError) as e:
+        raise click.ClickException(str(e))
+    for table, count in counts.items():
+        click.echo(f"Imported {count} rows into {table}")
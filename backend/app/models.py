@@ -49,6 +49,19 @@ class CachedDiagram(db.Model):
             'metadata': json.loads(self.diagram_metadata) if self.diagram_metadata else {}
         }
 
+class CachedExplanation(db.Model):
+    __tablename__ = 'cached_explanations'
+    __table_args__ = (db.UniqueConstraint('topic', 'depth', 'analogy', 'section'),)
+    
+    id = db.Column(db.Integer, primary_key=True)
+    topic = db.Column(db.String(200), nullable=False)  # Lowercased topic name
+    depth = db.Column(db.String(20), nullable=False)
+    analogy = db.Column(db.String(20), nullable=False)  # Empty for sections that don't use the analogy level
+    section = db.Column(db.String(30), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON string of the section content
+    cached_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
 class ExplanationLog(db.Model):
     __tablename__ = 'explanation_logs'
     
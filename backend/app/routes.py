@@ -1,12 +1,31 @@
 from flask import Blueprint, request, jsonify
 from app.services.explanation_service import ExplanationService
 from app.services.image_service import ImageService
+from app.services.admission_service import AdmissionController, AdmissionRejected
+from app.utils.validators import validate_levels
 from datetime import datetime
 
 api = Blueprint('api', __name__)
 
 explanation_service = ExplanationService()
 image_service = ImageService()
+admission = AdmissionController()
+
+@api.before_request
+def enforce_rate_limit():
+    # CORS preflights would make every browser POST cost two tokens
+    if request.method == 'OPTIONS' or request.endpoint == 'api.health':
+        return None
+    # Known integrations get their own bucket even when they share a proxy address
+    client_key = admission.client_key(request.headers.get('X-API-Key'), request.remote_addr)
+    admission.check_rate(client_key)
+
+@api.errorhandler(AdmissionRejected)
+def admission_rejected(e):
+    response = jsonify({'success': False, 'error': str(e)})
+    response.status_code = e.status_code
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
 
 @api.route('/health', methods=['GET'])
 def health():
@@ -20,6 +39,7 @@ def health():
     })
 
 @api.route('/explain', methods=['POST'])
+@admission.upstream
 def explain():
     data = request.json
     topic = data.get('topic')
@@ -29,10 +49,15 @@ def explain():
     if not topic:
         return jsonify({'success': False, 'error': 'Topic is required'}), 400
     
+    level_error = validate_levels(depth, analogy)
+    if level_error:
+        return jsonify({'success': False, 'error': level_error}), 400
+    
     start_time = datetime.utcnow()
     
     try:
         explanation = explanation_service.generate_explanation(topic, depth, analogy)
+        usage = explanation.pop('usage', None)
         diagrams = image_service.get_diagrams_for_topic(topic)
         
         response_time = (datetime.utcnow() - start_time).total_seconds()
@@ -43,7 +68,49 @@ def explain():
                 'explanation': explanation,
                 'diagrams': diagrams
             },
-            'response_time': response_time
+            'response_time': response_time,
+            'usage': usage
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api.route('/explain/sections', methods=['POST'])
+@admission.upstream
+def regenerate_sections():
+    data = request.json
+    topic = data.get('topic')
+    depth = data.get('depth', 'intermediate')
+    analogy = data.get('analogy', 'moderate')
+    # Accept the prompt headers too, e.g. "ANALOGY" or "CORE CONCEPTS"
+    sections = [str(s).strip().lower().replace(' ', '_') for s in data.get('sections', [])]
+    
+    if not topic:
+        return jsonify({'success': False, 'error': 'Topic is required'}), 400
+    
+    level_error = validate_levels(depth, analogy)
+    if level_error:
+        return jsonify({'success': False, 'error': level_error}), 400
+    
+    invalid = [s for s in sections if s not in ExplanationService.SECTION_FORMATS]
+    if not sections or invalid:
+        valid = ', '.join(ExplanationService.SECTION_FORMATS)
+        return jsonify({'success': False, 'error': f'Sections must be one or more of: {valid}'}), 400
+    
+    start_time = datetime.utcnow()
+    
+    try:
+        explanation = explanation_service.regenerate_sections(topic, depth, analogy, sections)
+        usage = explanation.pop('usage', None)
+        
+        response_time = (datetime.utcnow() - start_time).total_seconds()
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'explanation': explanation
+            },
+            'response_time': response_time,
+            'usage': usage
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -0,0 +1,156 @@
+import math
+import time
+import threading
+from functools import wraps
+from typing import Tuple
+from config import Config
+
+try:
+    import redis
+except ImportError:  # Only needed when RATE_LIMIT_STORAGE_URL points at Redis
+    redis = None
+
+class AdmissionRejected(Exception):
+    """Raised when a request is turned away; carries the HTTP status and Retry-After."""
+
+    def __init__(self, message: str, status_code: int, retry_after: float):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = max(1, math.ceil(retry_after))
+
+class InMemoryBucketStore:
+    """Token buckets held in this process; each worker enforces its own limits."""
+
+    # Prune idle buckets once this many clients are tracked
+    MAX_BUCKETS = 10000
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: int) -> Tuple[bool, float]:
+        """Take one token from the bucket; return (allowed, seconds until next token)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated_at) * rate)
+
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+
+            if len(self._buckets) > self.MAX_BUCKETS:
+                self._prune(now, rate, burst)
+
+        return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+    def _prune(self, now: float, rate: float, burst: int):
+        refill_time = burst / rate
+        for key, (_, updated_at) in list(self._buckets.items()):
+            if now - updated_at > refill_time:
+                del self._buckets[key]
+
+class RedisBucketStore:
+    """Token buckets shared by every worker and instance through Redis."""
+
+    # Refill and take atomically, using the Redis clock so instances agree on time
+    TAKE_SCRIPT = """
+    local now = redis.call('TIME')
+    now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+    local rate = tonumber(ARGV[1])
+    local burst = tonumber(ARGV[2])
+    local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens') or burst)
+    local updated_at = tonumber(redis.call('HGET', KEYS[1], 'updated_at') or now)
+    tokens = math.min(burst, tokens + (now - updated_at) * rate)
+    local allowed = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, url: str):
+        if redis is None:
+            raise RuntimeError("RATE_LIMIT_STORAGE_URL uses Redis but the redis package is not installed")
+        self.client = redis.Redis.from_url(url)
+        self.script = self.client.register_script(self.TAKE_SCRIPT)
+
+    def take(self, key: str, rate: float, burst: int) -> Tuple[bool, float]:
+        allowed, tokens = self.script(keys=[f'ratelimit:{key}'], args=[rate, burst])
+        if allowed:
+            return True, 0.0
+        return False, (1 - float(tokens)) / rate
+
+class AdmissionController:
+    """Per-client token buckets plus a global cap on upstream-bound requests."""
+
+    def __init__(self):
+        self._configure(vars(Config))
+
+    def init_app(self, app):
+        """Reload limits from the app config, e.g. a testing config passed to create_app."""
+        self._configure(app.config)
+
+    def _configure(self, config):
+        self.rate = config['RATE_LIMIT_PER_SECOND']
+        self.burst = config['RATE_LIMIT_BURST']
+        self.api_keys = config['API_KEYS']
+        self.store = self._create_store(config['RATE_LIMIT_STORAGE_URL'])
+
+        self.max_concurrency = config['UPSTREAM_MAX_CONCURRENCY']
+        self.queue_size = config['UPSTREAM_QUEUE_SIZE']
+        self.queue_timeout = config['UPSTREAM_QUEUE_TIMEOUT']
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._waiting = 0
+        self._waiting_lock = threading.Lock()
+
+    def client_key(self, api_key: str, remote_addr: str) -> str:
+        """Bucket by API key only for known integrations, so random keys can't mint buckets."""
+        if api_key and api_key in self.api_keys:
+            return f'key:{api_key}'
+        return f'ip:{remote_addr}'
+
+    def check_rate(self, client_key: str):
+        """Spend one token for the client or raise a 429 rejection."""
+        allowed, retry_after = self.store.take(client_key, self.rate, self.burst)
+        if not allowed:
+            raise AdmissionRejected('Rate limit exceeded', 429, retry_after)
+
+    def upstream(self, view):
+        """Decorate a view so it only runs while holding an upstream slot."""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            self._acquire_slot()
+            try:
+                return view(*args, **kwargs)
+            finally:
+                self._slots.release()
+        return wrapper
+
+    def _acquire_slot(self):
+        # Fast path: a free slot needs no queueing
+        if self._slots.acquire(blocking=False):
+            return
+
+        with self._waiting_lock:
+            if self._waiting >= self.queue_size:
+                raise AdmissionRejected('Service is at capacity', 503, self.queue_timeout)
+            self._waiting += 1
+
+        try:
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+        finally:
+            with self._waiting_lock:
+                self._waiting -= 1
+
+        if not acquired:
+            raise AdmissionRejected('Service is at capacity', 503, self.queue_timeout)
+
+    def _create_store(self, url: str):
+        if url.startswith(('redis://', 'rediss://')):
+            return RedisBucketStore(url)
+        return InMemoryBucketStore()
@@ -0,0 +1,39 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+class CacheService:
+    """In-process LRU cache with a per-entry time to live."""
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            value, expires_at = entry
+            if datetime.utcnow() >= expires_at:
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any):
+        """Store a value, evicting the least recently used entry when full."""
+        with self._lock:
+            self._entries[key] = (value, datetime.utcnow() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
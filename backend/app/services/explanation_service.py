@@ -1,22 +1,110 @@
+import json
+import time
 import requests
-from typing import Dict, Any
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Any, List, Optional, Tuple
 from config import Config
+from app.models import CachedExplanation, db
+from app.services.cache_service import CacheService
+from app.services.model_router import ModelRouter
+from app.services.token_budget import TokenBudget
 
 class ExplanationService:
+    # Response sections in prompt order, with the format Gemini is asked to follow
+    SECTION_FORMATS = {
+        'introduction': "INTRODUCTION:\n[1-2 sentences providing a brief overview]",
+        'core_concepts': "CORE CONCEPTS:\n[Key concepts explained at the specified depth level]",
+        'analogy': "ANALOGY:\n[Analogy section if requested, otherwise skip this section]",
+        'summary': "SUMMARY:\n[3-5 bullet points of key takeaways]"
+    }
+
     def __init__(self):
         self.api_key = Config.GEMINI_API_KEY
         self.base_url = Config.GEMINI_BASE_URL.rstrip("/")
         self.model = Config.GEMINI_MODEL
+        self.token_budget = TokenBudget()
+        self.router = ModelRouter()
+        self.cache = CacheService(Config.EXPLANATION_CACHE_MAX_ENTRIES, Config.EXPLANATION_CACHE_DURATION)
+        # Runs primary and hedged requests so a slow call can be raced
+        self.executor = ThreadPoolExecutor(max_workers=Config.GEMINI_EXECUTOR_WORKERS, thread_name_prefix='gemini')
         
     def generate_explanation(self, topic: str, depth: str, analogy: str) -> Dict[str, Any]:
         """Generate explanation using Gemini API."""
         prompt = self._build_prompt(topic, depth, analogy)
+        max_output_tokens = self.token_budget.budget_for(depth, analogy)
+        cache_key = self._explanation_key(topic, depth, analogy)
         
-        headers = {
-            'x-goog-api-key': self.api_key,
-            'Content-Type': 'application/json'
-        }
+        try:
+            explanation, usage = self._run_prompt(prompt, depth, max_output_tokens)
+        except RuntimeError:
+            cached = self._cached_explanation(topic, depth, analogy)
+            if cached is None:
+                raise
+            self.router.record_decision('cache_fallback')
+            return {**cached, 'usage': {'model': None, 'source': 'cache'}}
         
+        # Never cache a cut-off or incomplete answer over a good one
+        if not usage['truncated']:
+            if not self._missing_sections(explanation, analogy):
+                self.cache.set(cache_key, explanation)
+            self._store_sections(topic, depth, analogy, {
+                section: value for section, value in explanation.items() if value
+            })
+        self.token_budget.record(depth, analogy, usage, usage['truncated'])
+        
+        return {**explanation, 'usage': usage}
+
+    def regenerate_sections(self, topic: str, depth: str, analogy: str, sections: List[str]) -> Dict[str, Any]:
+        """Regenerate only the requested sections, reusing cached ones for the rest."""
+        explanation = {}
+        stale = []
+        for section in self.SECTION_FORMATS:
+            cached = None
+            if section not in sections:
+                cached = self._get_section(topic, depth, analogy, section)
+            if cached is not None:
+                explanation[section] = cached
+            elif section == 'analogy' and analogy == 'none':
+                explanation[section] = ''
+            else:
+                stale.append(section)
+        
+        usage = {'model': None, 'source': 'cache', 'regenerated': []}
+        if stale:
+            # Nothing reusable means this is just a full generation
+            scope = None if len(stale) == len(self.SECTION_FORMATS) else stale
+            prompt = self._build_prompt(topic, depth, analogy, scope)
+            max_output_tokens = self.token_budget.budget_for(depth, analogy, scope)
+            
+            generated, usage = self._run_prompt(prompt, depth, max_output_tokens)
+            usage['regenerated'] = []
+            self.token_budget.record(depth, analogy, usage, usage['truncated'], scope)
+            
+            for section in stale:
+                if generated[section]:
+                    usage['regenerated'].append(section)
+                    explanation[section] = generated[section]
+                    continue
+                
+                # Gemini skipped the header: keep the previous answer rather than blank it
+                previous = self._get_section(topic, depth, analogy, section)
+                if previous is None:
+                    raise RuntimeError(f"Parsing error: Gemini response is missing the {section} section")
+                explanation[section] = previous
+            
+            if not usage['truncated']:
+                self._store_sections(topic, depth, analogy, {
+                    section: explanation[section] for section in usage['regenerated']
+                })
+        
+        explanation = {section: explanation[section] for section in self.SECTION_FORMATS}
+        if not usage.get('truncated'):
+            self.cache.set(self._explanation_key(topic, depth, analogy), explanation)
+        return {**explanation, 'usage': usage}
+
+    def _run_prompt(self, prompt: str, depth: str, max_output_tokens: int) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Send a prompt through the model router and parse the structured reply."""
         payload = {
             'contents': [
                 {
@@ -27,29 +115,164 @@ class ExplanationService:
             ],
             'generationConfig': {
                 'temperature': Config.GEMINI_TEMPERATURE,
-                'maxOutputTokens': Config.GEMINI_MAX_OUTPUT_TOKENS,
+                'maxOutputTokens': max_output_tokens,
                 'topP': 0.8,
                 'topK': 40
             }
         }
         
+        result, model = self._generate_with_fallback(self.router.route(depth), payload)
+        usage = self._extract_usage(result)
+        
+        # An adaptive budget that was too tight cuts off SUMMARY, which comes last;
+        # retry once at the ceiling rather than return a truncated answer
+        retried = usage['truncated'] and max_output_tokens < Config.GEMINI_MAX_OUTPUT_TOKENS
+        if retried:
+            max_output_tokens = Config.GEMINI_MAX_OUTPUT_TOKENS
+            payload['generationConfig']['maxOutputTokens'] = max_output_tokens
+            result, model = self._generate_with_fallback(self.router.route(depth), payload)
+            usage = self._extract_usage(result)
+        
+        explanation = self._parse_explanation(self._extract_text_from_response(result))
+        usage['retried_after_truncation'] = retried
+        usage['model'] = model
+        usage['source'] = 'gemini'
+        usage['estimated_prompt_tokens'] = self.token_budget.estimate_prompt_tokens(prompt)
+        usage['max_output_tokens'] = max_output_tokens
+        return explanation, usage
+
+    def _missing_sections(self, explanation: Dict[str, Any], analogy: str) -> List[str]:
+        """Sections that came back empty although the prompt asked for them."""
+        return [
+            section for section in self.SECTION_FORMATS
+            if not explanation[section] and not (section == 'analogy' and analogy == 'none')
+        ]
+
+    def _cached_explanation(self, topic: str, depth: str, analogy: str) -> Optional[Dict[str, Any]]:
+        """Return a complete cached explanation, assembling it from stored sections if needed."""
+        cached = self.cache.get(self._explanation_key(topic, depth, analogy))
+        if cached is not None:
+            return cached
+        
+        explanation = {
+            section: self._get_section(topic, depth, analogy, section) for section in self.SECTION_FORMATS
+        }
+        if analogy == 'none' and explanation['analogy'] is None:
+            explanation['analogy'] = ''
+        if any(value is None for value in explanation.values()):
+            return None
+        return explanation
+
+    def _get_section(self, topic: str, depth: str, analogy: str, section: str) -> Optional[Any]:
+        """Look a section up in memory, then in the database shared by workers and snapshots."""
+        key = self._section_key(topic, depth, analogy, section)
+        value = self.cache.get(key)
+        if value is not None:
+            return value
+        
+        row = CachedExplanation.query.filter(
+            CachedExplanation.topic == topic.lower(),
+            CachedExplanation.depth == depth,
+            CachedExplanation.analogy == self._section_analogy(analogy, section),
+            CachedExplanation.section == section,
+            CachedExplanation.expires_at > datetime.utcnow()
+        ).first()
+        if row is None:
+            return None
+        
+        value = json.loads(row.payload)
+        self.cache.set(key, value)
+        return value
+
+    def _store_sections(self, topic: str, depth: str, analogy: str, sections: Dict[str, Any]):
+        """Cache sections in memory and persist them to the database."""
+        expires_at = datetime.utcnow() + timedelta(seconds=Config.EXPLANATION_CACHE_DURATION)
+        
+        try:
+            for section, value in sections.items():
+                self.cache.set(self._section_key(topic, depth, analogy, section), value)
+                
+                section_analogy = self._section_analogy(analogy, section)
+                CachedExplanation.query.filter_by(
+                    topic=topic.lower(), depth=depth, analogy=section_analogy, section=section
+                ).delete()
+                db.session.add(CachedExplanation(
+                    topic=topic.lower(),
+                    depth=depth,
+                    analogy=section_analogy,
+                    section=section,
+                    payload=json.dumps(value),
+                    expires_at=expires_at
+                ))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Failed to cache explanation sections: {e}")
+
+    def _section_analogy(self, analogy: str, section: str) -> str:
+        # Only the analogy section depends on the analogy level
+        return analogy if section == 'analogy' else ''
+
+    def _explanation_key(self, topic: str, depth: str, analogy: str) -> str:
+        return f'explanation:{topic.lower()}:{depth}:{analogy}'
+
+    def _section_key(self, topic: str, depth: str, analogy: str, section: str) -> str:
+        return f'section:{topic.lower()}:{depth}:{self._section_analogy(analogy, section)}:{section}'
+
+    def _generate_with_fallback(self, models: List[str], payload: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+        """Call the primary model, hedging or falling back to the other one."""
+        primary, fallback = models
+        futures = {self.executor.submit(self._call_model, primary, payload): primary}
+        
+        # Hedge once the primary is slower than its usual latency percentile
+        done, _ = wait(futures, timeout=self.router.hedge_delay(primary))
+        if not done:
+            self.router.record_decision(f'{fallback}:hedge')
+            futures[self.executor.submit(self._call_model, fallback, payload)] = fallback
+        
+        errors = []
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    return future.result(), futures[future]
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    errors.append(f"{futures[future]}: {e}")
+            
+            if not pending and fallback not in futures.values():
+                self.router.record_decision(f'{fallback}:fallback')
+                future = self.executor.submit(self._call_model, fallback, payload)
+                futures[future] = fallback
+                pending = {future}
+        
+        raise RuntimeError(f"Network/API error: {'; '.join(errors)}")
+
+    def _call_model(self, model: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Send one generateContent request and record its latency with the router."""
+        headers = {
+            'x-goog-api-key': self.api_key,
+            'Content-Type': 'application/json'
+        }
+        
+        start = time.monotonic()
         try:
             response = requests.post(
-                f'{self.base_url}/models/{self.model}:generateContent',
+                f'{self.base_url}/models/{model}:generateContent',
                 headers=headers,
                 json=payload,
-                timeout=30
+                timeout=Config.GEMINI_REQUEST_TIMEOUT
             )
             response.raise_for_status()
             result = response.json()
-
-            explanation_text = self._extract_text_from_response(result)
-            return self._parse_explanation(explanation_text)
+            # Validate here so an empty answer counts as a failure and triggers fallback
+            self._extract_text_from_response(result)
+        except (requests.exceptions.RequestException, ValueError):
+            self.router.record_result(model, time.monotonic() - start, success=False)
+            raise
         
-        except requests.exceptions.RequestException as e:
-            raise RuntimeError(f"Network/API error: {e}")
-        except ValueError as e:
-            raise RuntimeError(f"Parsing error: {e}")
+        self.router.record_result(model, time.monotonic() - start, success=True)
+        return result
 
     def _extract_text_from_response(self, response: Dict[str, Any]) -> str:
         """Extract text content from Gemini API response."""
@@ -66,8 +289,21 @@ class ExplanationService:
         
         return parts[0]['text'].strip()
 
-    def _build_prompt(self, topic: str, depth: str, analogy: str) -> str:
-        """Build prompt based on parameters."""
+    def _extract_usage(self, response: Dict[str, Any]) -> Dict[str, Any]:
+        """Extract token counts and truncation status from Gemini API response."""
+        metadata = response.get('usageMetadata', {})
+        candidates = response.get('candidates') or [{}]
+        
+        return {
+            'prompt_tokens': metadata.get('promptTokenCount'),
+            'candidate_tokens': metadata.get('candidatesTokenCount'),
+            'total_tokens': metadata.get('totalTokenCount'),
+            'finish_reason': candidates[0].get('finishReason'),
+            'truncated': candidates[0].get('finishReason') == 'MAX_TOKENS'
+        }
+
+    def _build_prompt(self, topic: str, depth: str, analogy: str, sections: Optional[List[str]] = None) -> str:
+        """Build prompt based on parameters, optionally asking for only some sections."""
         depth_instructions = {
             'beginner': 'Use simple language, avoid jargon, explain concepts as if to a middle school student.',
             'intermediate': 'Use moderate technical detail, include some scientific terms with explanations.',
@@ -80,16 +316,19 @@ class ExplanationService:
             'none': 'Do not use analogies.'
         }
         
+        if sections:
+            structure = "Write only the following sections, structured exactly as follows:\n\n"
+        else:
+            structure = "Structure your response exactly as follows:\n\n"
+            sections = list(self.SECTION_FORMATS)
+        
         return (
             f'You are an expert educational content generator. Explain the topic "{topic}" with the following requirements:\n\n'
             f'Depth Level: {depth} - {depth_instructions.get(depth, "")}\n'
             f'Analogy Level: {analogy} - {analogy_instructions.get(analogy, "")}\n\n'
-            "Structure your response exactly as follows:\n\n"
-            "INTRODUCTION:\n[1-2 sentences providing a brief overview]\n\n"
-            "CORE CONCEPTS:\n[Key concepts explained at the specified depth level]\n\n"
-            "ANALOGY:\n[Analogy section if requested, otherwise skip this section]\n\n"
-            "SUMMARY:\n[3-5 bullet points of key takeaways]\n\n"
-            "Keep the explanation accurate, educational, and aligned with academic standards. "
+            + structure
+            + "".join(f"{self.SECTION_FORMATS[section]}\n\n" for section in sections)
+            + "Keep the explanation accurate, educational, and aligned with academic standards. "
             "Ensure the content is factually correct and age-appropriate for the specified depth level."
         )
 
@@ -139,7 +378,10 @@ class ExplanationService:
         """Get information about the current Gemini model."""
         return {
             'model_name': self.model,
+            'models': self.router.models,
             'provider': 'Google Gemini',
             'max_tokens': Config.GEMINI_MAX_OUTPUT_TOKENS,
-            'temperature': Config.GEMINI_TEMPERATURE
+            'temperature': Config.GEMINI_TEMPERATURE,
+            'token_usage': self.token_budget.get_stats(),
+            'routing': self.router.get_stats()
         }
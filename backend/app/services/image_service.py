@@ -5,6 +5,7 @@ from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 from config import Config
 from app.models import CachedDiagram, Topic, db
+from app.services.ranking_service import DiagramRanker
 
 class ImageService:
     def __init__(self):
@@ -14,6 +15,7 @@ class ImageService:
         self.pixabay_api_key = Config.PIXABAY_API_KEY
         self.access_token = None
         self.token_expires_at = None
+        self.ranker = DiagramRanker()
         
     def get_diagrams_for_topic(self, topic_name: str) -> List[Dict[str, Any]]:
         """Get relevant diagrams for a topic."""
@@ -21,7 +23,7 @@ class ImageService:
         # First check cache
         cached_diagrams = self._get_cached_diagrams(topic_name)
         if cached_diagrams:
-            return cached_diagrams
+            return self.ranker.rank(topic_name, cached_diagrams)
         
         # If not cached, fetch from APIs
         diagrams = []
@@ -58,11 +60,16 @@ class ImageService:
             except Exception as e:
                 print(f"Wikimedia API failed: {e}")
         
+        # Drop duplicates before caching so the cache only holds unique candidates
+        diagrams = self.ranker.dedupe(diagrams)
+        # Hash thumbnails now so the hashes are cached and ranking stays offline
+        self.ranker.add_thumbnail_hashes(topic_name, diagrams)
+        
         # Cache the results
         if diagrams:
             self._cache_diagrams(topic_name, diagrams)
         
-        return diagrams[:3]  # Return top 3 most relevant
+        return self.ranker.rank(topic_name, diagrams)  # Return top 3 most relevant
     
     def _get_cached_diagrams(self, topic_name: str) -> List[Dict[str, Any]]:
         """Get cached diagrams that haven't expired."""
@@ -137,12 +144,12 @@ class ImageService:
         
         diagrams = []
         
-        for search_term in search_terms[:2]:  # Try top 2 search terms
+        for search_term in search_terms[:Config.IMAGE_SEARCH_TERMS]:
             params = {
                 'query': f'{search_term} diagram illustration educational',
                 'image_type': 'illustration',
                 'category': 'education',
-                'per_page': 3,
+                'per_page': Config.IMAGE_SEARCH_PER_PAGE,
                 'sort': 'relevance'
             }
             
@@ -167,6 +174,7 @@ class ImageService:
                         'metadata': {
                             'id': item['id'],
                             'keywords': item.get('keywords', []),
+                            'description': item.get('description', ''),
                             'contributor': item.get('contributor', {}).get('contributor', '')
                         }
                     }
@@ -188,10 +196,10 @@ class ImageService:
         search_terms = self._generate_search_terms(topic)
         diagrams = []
         
-        for search_term in search_terms[:2]:
+        for search_term in search_terms[:Config.IMAGE_SEARCH_TERMS]:
             params = {
                 'query': f'{search_term} diagram education illustration science',
-                'per_page': 3,
+                'per_page': Config.IMAGE_SEARCH_PER_PAGE,
                 'orientation': 'landscape'
             }
             
@@ -215,6 +223,7 @@ class ImageService:
                         'alt_text': item.get('alt_description', f'{topic} educational illustration'),
                         'metadata': {
                             'id': item['id'],
+                            'description': item.get('alt_description') or item.get('description') or '',
                             'photographer': item['user']['name'],
                             'license': 'Unsplash License'
                         }
@@ -233,14 +242,14 @@ class ImageService:
         search_terms = self._generate_search_terms(topic)
         diagrams = []
         
-        for search_term in search_terms[:2]:
+        for search_term in search_terms[:Config.IMAGE_SEARCH_TERMS]:
             params = {
                 'key': self.pixabay_api_key,
                 'q': f'{search_term}+diagram+education',
                 'image_type': 'illustration',
                 'category': 'education',
                 'safesearch': 'true',
-                'per_page': 3
+                'per_page': Config.IMAGE_SEARCH_PER_PAGE
             }
             
             try:
@@ -287,7 +296,7 @@ class ImageService:
                 'list': 'search',
                 'srsearch': f'{search_term} diagram filetype:svg OR filetype:png',
                 'srnamespace': 6,  # File namespace
-                'srlimit': 3
+                'srlimit': Config.IMAGE_SEARCH_PER_PAGE
             }
             
             try:
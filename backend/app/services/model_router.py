@@ -0,0 +1,130 @@
+import time
+import threading
+from collections import deque, Counter
+from typing import Dict, Any, List, Optional, Tuple
+from config import Config
+
+class ModelRouter:
+    """Pick a Gemini model per request from depth level and live latency/error stats."""
+
+    # Upper bounds (seconds) of the latency histogram buckets
+    LATENCY_BUCKETS = [0.5, 1, 2, 5, 10, 20, 30]
+
+    def __init__(self):
+        self.fast_model = Config.GEMINI_FAST_MODEL
+        self.slow_model = Config.GEMINI_SLOW_MODEL
+        self.window = Config.GEMINI_ROUTER_WINDOW
+        self.sample_ttl = Config.GEMINI_ROUTER_SAMPLE_TTL
+
+        self._latencies = {model: deque(maxlen=self.window) for model in self.models}
+        self._outcomes = {model: deque(maxlen=self.window) for model in self.models}
+        self._decisions = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def models(self) -> List[str]:
+        return [self.fast_model, self.slow_model]
+
+    def route(self, depth: str) -> List[str]:
+        """Return models in the order to try them: primary first, fallback second."""
+        if depth in Config.GEMINI_SLOW_MODEL_DEPTHS:
+            primary, fallback = self.slow_model, self.fast_model
+        else:
+            primary, fallback = self.fast_model, self.slow_model
+
+        reason = 'depth'
+        if self._is_degraded(primary) and not self._is_degraded(fallback):
+            primary, fallback = fallback, primary
+            reason = 'degraded'
+
+        self.record_decision(f'{primary}:{reason}')
+        return [primary, fallback]
+
+    def hedge_delay(self, model: str) -> Optional[float]:
+        """Seconds to wait on a model before hedging, or None without enough samples."""
+        latencies, _ = self._recent(model)
+        if len(latencies) < Config.GEMINI_ROUTER_MIN_SAMPLES:
+            return None
+        return self._percentile(latencies, Config.GEMINI_HEDGE_PERCENTILE)
+
+    def record_result(self, model: str, latency: float, success: bool):
+        """Record the latency and outcome of one upstream call."""
+        now = time.monotonic()
+        with self._lock:
+            # Failed calls often return fast, keep them out of the latency window
+            if success:
+                self._latencies[model].append((now, latency))
+            self._outcomes[model].append((now, success))
+
+    def record_decision(self, decision: str):
+        with self._lock:
+            self._decisions[decision] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Summarize routing decisions and per-model latency histograms.
+
+        Everything per model covers the same window of recent calls that drives routing.
+        """
+        labels = [f'<={bound}s' for bound in self.LATENCY_BUCKETS] + [f'>{self.LATENCY_BUCKETS[-1]}s']
+        models = {}
+
+        for model in self.models:
+            latencies, outcomes = self._recent(model)
+            histogram = [0] * len(labels)
+            for latency in latencies:
+                histogram[self._bucket(latency)] += 1
+
+            models[model] = {
+                'requests': len(outcomes),
+                'error_rate': self._error_rate(outcomes),
+                'p50_latency': self._percentile(latencies, 0.5) if latencies else None,
+                'p95_latency': self._percentile(latencies, 0.95) if latencies else None,
+                'latency_histogram': dict(zip(labels, histogram))
+            }
+
+        with self._lock:
+            decisions = dict(self._decisions)
+
+        return {
+            'fast_model': self.fast_model,
+            'slow_model': self.slow_model,
+            'decisions': decisions,
+            'models': models
+        }
+
+    def _is_degraded(self, model: str) -> bool:
+        latencies, outcomes = self._recent(model)
+        if len(outcomes) < Config.GEMINI_ROUTER_MIN_SAMPLES:
+            return False
+        if self._error_rate(outcomes) > Config.GEMINI_ROUTER_MAX_ERROR_RATE:
+            return True
+        return bool(latencies) and self._percentile(latencies, 0.95) > Config.GEMINI_ROUTER_MAX_P95_LATENCY
+
+    def _recent(self, model: str) -> Tuple[List[float], List[bool]]:
+        """Drop samples older than the TTL; return sorted latencies and outcomes.
+
+        Expiry lets a model marked degraded fall below the minimum sample count and
+        get routed to again, instead of staying out of rotation for good.
+        """
+        cutoff = time.monotonic() - self.sample_ttl
+        with self._lock:
+            for window in (self._latencies[model], self._outcomes[model]):
+                while window and window[0][0] < cutoff:
+                    window.popleft()
+            latencies = sorted(latency for _, latency in self._latencies[model])
+            outcomes = [success for _, success in self._outcomes[model]]
+        return latencies, outcomes
+
+    def _bucket(self, latency: float) -> int:
+        for index, bound in enumerate(self.LATENCY_BUCKETS):
+            if latency <= bound:
+                return index
+        return len(self.LATENCY_BUCKETS)
+
+    def _error_rate(self, outcomes: List[bool]) -> float:
+        if not outcomes:
+            return 0.0
+        return outcomes.count(False) / len(outcomes)
+
+    def _percentile(self, sorted_values: List[float], fraction: float) -> float:
+        return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
@@ -0,0 +1,205 @@
+import re
+import requests
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, wait
+from io import BytesIO
+from typing import List, Dict, Any, Optional, Set
+from config import Config
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional, perceptual dedup is skipped without it
+    Image = None
+
+class DiagramRanker:
+    """Dedupe and rank diagram candidates gathered from the image providers."""
+
+    # Mirrors the order ImageService queries the providers in
+    PROVIDER_PRIORITY = {
+        'shutterstock': 1.0,
+        'unsplash': 0.75,
+        'pixabay': 0.5,
+        'wikimedia': 0.25
+    }
+
+    LICENSE_SCORES = {
+        'creative commons': 1.0,
+        'pixabay license': 0.8,
+        'unsplash license': 0.8
+    }
+    DEFAULT_LICENSE_SCORE = 0.5
+
+    # Relative weight of keyword overlap, provider priority and license
+    WEIGHTS = np.array([0.6, 0.25, 0.15])
+
+    # Max Hamming distance between two 64-bit dHashes to call them duplicates
+    HASH_DISTANCE_THRESHOLD = 6
+
+    # Extra candidates hashed beyond the top slots, to refill slots lost to near-duplicates
+    HASH_SPARES = 1
+
+    STOPWORDS = {'a', 'an', 'and', 'of', 'the', 'in', 'on', 'for', 'to', 'with'}
+
+    def __init__(self):
+        # Shared across requests so cold fetches don't each spin up a pool
+        self.executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='thumbnail')
+
+    def rank(self, topic: str, diagrams: List[Dict[str, Any]], limit: int = 3) -> List[Dict[str, Any]]:
+        """Return the top `limit` unique diagrams for a topic, best first."""
+        candidates = self.dedupe(diagrams)
+        if not candidates:
+            return []
+
+        scores = self._score(topic, candidates)
+        # Stable sort keeps provider insertion order for ties
+        order = np.argsort(-scores, kind='stable')
+
+        ranked = []
+        seen_hashes = []
+        for index in order:
+            diagram = candidates[index]
+            thumb_hash = self._stored_hash(diagram)
+            if thumb_hash is not None:
+                if any(self._hamming(thumb_hash, seen) <= self.HASH_DISTANCE_THRESHOLD for seen in seen_hashes):
+                    continue
+                seen_hashes.append(thumb_hash)
+            ranked.append(diagram)
+            if len(ranked) >= limit:
+                break
+
+        return ranked
+
+    def add_thumbnail_hashes(self, topic: str, diagrams: List[Dict[str, Any]], limit: int = 3):
+        """Hash the thumbnails that can reach the top `limit` and store them in metadata.
+
+        The hash is persisted with the cached diagram, so `rank` never downloads images.
+        Only the best-scoring candidates are fetched, and all of them share one deadline.
+        """
+        if Image is None or not diagrams:
+            return
+
+        order = np.argsort(-self._score(topic, diagrams), kind='stable')
+        pending = [
+            diagrams[index] for index in order[:limit + self.HASH_SPARES]
+            if diagrams[index].get('thumbnail_url')
+            and 'thumbnail_hash' not in (diagrams[index].get('metadata') or {})
+        ]
+
+        futures = {
+            self.executor.submit(self._thumbnail_hash, diagram['thumbnail_url']): diagram
+            for diagram in pending
+        }
+        # Stragglers are left unhashed; they simply skip perceptual dedup
+        done, _ = wait(futures, timeout=Config.THUMBNAIL_HASH_DEADLINE)
+        for future in done:
+            thumb_hash = future.result()
+            if thumb_hash is not None:
+                # Hex string: a 64-bit int would lose precision in JavaScript clients
+                futures[future].setdefault('metadata', {})['thumbnail_hash'] = f'{thumb_hash:016x}'
+
+    def dedupe(self, diagrams: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Drop repeats of the same provider id or image URL."""
+        seen_ids = set()
+        seen_urls = set()
+        unique = []
+
+        for diagram in diagrams:
+            metadata = diagram.get('metadata') or {}
+            provider_id = metadata.get('id') or metadata.get('title')
+            id_key = (diagram.get('source'), str(provider_id)) if provider_id else None
+            url_key = self._normalize_url(diagram.get('image_url'))
+
+            if (id_key and id_key in seen_ids) or (url_key and url_key in seen_urls):
+                continue
+
+            if id_key:
+                seen_ids.add(id_key)
+            if url_key:
+                seen_urls.add(url_key)
+            unique.append(diagram)
+
+        return unique
+
+    def _score(self, topic: str, candidates: List[Dict[str, Any]]) -> np.ndarray:
+        """Score every candidate at once as a weighted sum of its features."""
+        topic_tokens = self._tokenize(topic)
+
+        overlap = np.array([
+            self._keyword_overlap(topic_tokens, candidate) for candidate in candidates
+        ], dtype=float)
+        priority = np.array([
+            self.PROVIDER_PRIORITY.get(candidate.get('source'), 0.0) for candidate in candidates
+        ], dtype=float)
+        license_score = np.array([
+            self._license_score(candidate) for candidate in candidates
+        ], dtype=float)
+
+        features = np.column_stack((overlap, priority, license_score))
+        return features @ self.WEIGHTS
+
+    def _keyword_overlap(self, topic_tokens: Set[str], diagram: Dict[str, Any]) -> float:
+        """Fraction of topic tokens found in the diagram's keywords, tags or description."""
+        if not topic_tokens:
+            return 0.0
+
+        metadata = diagram.get('metadata') or {}
+        terms = list(metadata.get('keywords') or []) + list(metadata.get('tags') or [])
+        if not terms:
+            # Unsplash and most Shutterstock results carry no keywords; use their description,
+            # or the Wikimedia file title and snippet
+            terms = [
+                metadata.get(field) for field in ('description', 'title', 'snippet')
+                if metadata.get(field)
+            ]
+        if not terms:
+            # Rows cached before descriptions were stored only have the display text
+            terms = [diagram.get('alt_text') or '', diagram.get('caption') or '']
+
+        term_tokens = set()
+        for term in terms:
+            term_tokens |= self._tokenize(str(term))
+
+        return len(topic_tokens & term_tokens) / len(topic_tokens)
+
+    def _license_score(self, diagram: Dict[str, Any]) -> float:
+        metadata = diagram.get('metadata') or {}
+        license_name = str(metadata.get('license', '')).lower()
+        return self.LICENSE_SCORES.get(license_name, self.DEFAULT_LICENSE_SCORE)
+
+    def _tokenize(self, text: str) -> Set[str]:
+        return {
+            token for token in re.findall(r'[a-z0-9]+', text.lower())
+            if token not in self.STOPWORDS
+        }
+
+    def _normalize_url(self, url: Optional[str]) -> Optional[str]:
+        if not url:
+            return None
+        return url.split('?', 1)[0].rstrip('/').lower()
+
+    def _thumbnail_hash(self, thumbnail_url: Optional[str]) -> Optional[int]:
+        """Compute a 64-bit difference hash of a thumbnail, or None if unavailable."""
+        if Image is None or not thumbnail_url:
+            return None
+
+        try:
+            response = requests.get(thumbnail_url, timeout=Config.THUMBNAIL_HASH_DEADLINE)
+            response.raise_for_status()
+            image = Image.open(BytesIO(response.content)).convert('L').resize((9, 8))
+        except Exception as e:
+            print(f"Thumbnail hash failed for '{thumbnail_url}': {e}")
+            return None
+
+        pixels = np.asarray(image, dtype=np.int16)
+        bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+        return int(np.packbits(bits).view('>u8')[0])
+
+    def _stored_hash(self, diagram: Dict[str, Any]) -> Optional[int]:
+        thumb_hash = (diagram.get('metadata') or {}).get('thumbnail_hash')
+        try:
+            return int(thumb_hash, 16) if thumb_hash else None
+        except ValueError:
+            return None
+
+    def _hamming(self, a: int, b: int) -> int:
+        return bin(a ^ b).count('1')
@@ -0,0 +1,145 @@
+import gzip
+import json
+from datetime import datetime, timedelta
+from typing import Dict, Any, Iterator, List
+from config import Config
+from app.models import Topic, CachedDiagram, CachedExplanation, db
+
+SNAPSHOT_FORMAT = 'academic-platform-snapshot'
+SNAPSHOT_VERSION = 3
+
+class SnapshotService:
+    """Export and import cached content as gzip-compressed JSON lines."""
+
+    # Parents before children so foreign keys resolve during import
+    MODELS = [Topic, CachedDiagram, CachedExplanation]
+
+    def __init__(self, batch_size: int = 1000):
+        self.batch_size = batch_size
+        self.tables = {model.__tablename__: model.__table__ for model in self.MODELS}
+
+    def export_snapshot(self, path: str) -> Dict[str, int]:
+        """Stream every cached row to `path`, one JSON object per line."""
+        counts = {}
+
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            header = {
+                'format': SNAPSHOT_FORMAT,
+                'version': SNAPSHOT_VERSION,
+                'created_at': datetime.utcnow().isoformat()
+            }
+            f.write(json.dumps(header) + '\n')
+
+            for name, table in self.tables.items():
+                counts[name] = 0
+                for row in self._iter_rows(table):
+                    f.write(json.dumps({'table': name, 'row': row}, separators=(',', ':')) + '\n')
+                    counts[name] += 1
+
+        return counts
+
+    def import_snapshot(self, path: str, replace: bool = False, keep_expiry: bool = False) -> Dict[str, int]:
+        """Bulk load a snapshot, keeping primary keys so relationships stay intact.
+
+        Cached rows get a fresh expiry from import time unless `keep_expiry` is set,
+        otherwise a snapshot older than the cache duration would load only stale rows.
+        """
+        counts = {name: 0 for name in self.tables}
+        now = datetime.utcnow()
+        expiry = {
+            CachedDiagram.__tablename__: now + timedelta(seconds=Config.DIAGRAM_CACHE_DURATION),
+            CachedExplanation.__tablename__: now + timedelta(seconds=Config.EXPLANATION_CACHE_DURATION)
+        }
+
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            header = json.loads(f.readline() or '{}')
+            if header.get('format') != SNAPSHOT_FORMAT or header.get('version') != SNAPSHOT_VERSION:
+                raise ValueError(f"Unsupported snapshot: {header.get('format')} v{header.get('version')}")
+
+            current_table = None
+            batch: List[Dict[str, Any]] = []
+
+            try:
+                self._prepare_tables(replace)
+
+                for line in f:
+                    record = json.loads(line)
+                    name = record['table']
+                    if name not in self.tables:
+                        raise ValueError(f"Unknown table in snapshot: {name}")
+
+                    if batch and (name != current_table or len(batch) >= self.batch_size):
+                        self._insert_batch(current_table, batch)
+                        counts[current_table] += len(batch)
+                        batch = []
+
+                    current_table = name
+                    row = self._decode_row(self.tables[name], record['row'])
+                    if name in expiry and not keep_expiry:
+                        row['expires_at'] = expiry[name]
+                    batch.append(row)
+
+                if batch:
+                    self._insert_batch(current_table, batch)
+                    counts[current_table] += len(batch)
+
+                self._reset_sequences()
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+
+        return counts
+
+    def _iter_rows(self, table) -> Iterator[Dict[str, Any]]:
+        """Yield rows in primary key order, one bounded page at a time."""
+        last_id = 0
+        while True:
+            page = db.session.execute(
+                db.select(table)
+                .where(table.c.id > last_id)
+                .order_by(table.c.id)
+                .limit(self.batch_size)
+            ).mappings().all()
+
+            if not page:
+                return
+
+            for row in page:
+                yield {
+                    key: value.isoformat() if isinstance(value, datetime) else value
+                    for key, value in row.items()
+                }
+            last_id = page[-1]['id']
+
+    def _decode_row(self, table, row: Dict[str, Any]) -> Dict[str, Any]:
+        for column in table.columns:
+            value = row.get(column.name)
+            if value is not None and isinstance(column.type, db.DateTime):
+                row[column.name] = datetime.fromisoformat(value)
+        return row
+
+    def _prepare_tables(self, replace: bool):
+        """Clear target tables, or refuse to merge into tables that already hold rows."""
+        if replace:
+            for table in reversed(list(self.tables.values())):
+                db.session.execute(table.delete())
+            return
+
+        for name, table in self.tables.items():
+            if db.session.execute(db.select(table.c.id).limit(1)).first():
+                raise ValueError(f"Table '{name}' is not empty; use --replace to overwrite it")
+
+    def _insert_batch(self, name: str, batch: List[Dict[str, Any]]):
+        db.session.execute(self.tables[name].insert(), batch)
+
+    def _reset_sequences(self):
+        """Move PostgreSQL id sequences past the imported keys; SQLite needs nothing."""
+        if db.engine.dialect.name != 'postgresql':
+            return
+
+        for name in self.tables:
+            db.session.execute(db.text(
+                f"SELECT setval(pg_get_serial_sequence('{name}', 'id'), "
+                f"COALESCE((SELECT MAX(id) FROM {name}), 0) + 1, false)"
+            ))
@@ -0,0 +1,111 @@
+import threading
+from collections import deque
+from typing import Dict, Any, Optional, Sequence
+from config import Config
+
+class TokenBudget:
+    """Track output lengths per (depth, analogy) and adapt maxOutputTokens to them."""
+
+    # Rough characters-per-token ratio used before Gemini reports real counts
+    CHARS_PER_TOKEN = 4
+
+    def __init__(self):
+        self.base_budgets = Config.GEMINI_TOKEN_BUDGETS
+        self.section_budgets = Config.GEMINI_SECTION_TOKEN_BUDGETS
+        self.analogy_adjustments = Config.GEMINI_ANALOGY_TOKEN_ADJUSTMENTS
+        self.min_tokens = Config.GEMINI_MIN_OUTPUT_TOKENS
+        self.max_tokens = Config.GEMINI_MAX_OUTPUT_TOKENS
+        self.headroom = Config.GEMINI_TOKEN_HEADROOM
+        self.window = Config.GEMINI_TOKEN_HISTORY_SIZE
+
+        self._observed: Dict[tuple, deque] = {}
+        self._truncations: Dict[tuple, int] = {}
+        self._totals = {'requests': 0, 'prompt_tokens': 0, 'candidate_tokens': 0}
+        self._last_usage: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    def estimate_prompt_tokens(self, prompt: str) -> int:
+        """Estimate prompt size in tokens before the request is sent."""
+        return max(1, len(prompt) // self.CHARS_PER_TOKEN)
+
+    def budget_for(self, depth: str, analogy: str, sections: Optional[Sequence[str]] = None) -> int:
+        """Return the maxOutputTokens to request for a depth/analogy combination.
+
+        `sections` narrows the budget to a partial regeneration of those sections.
+        """
+        key = self._key(depth, analogy, sections)
+        if sections:
+            static_budget = sum(self.section_budgets.get(section, 0) for section in sections)
+        else:
+            static_budget = (
+                self.base_budgets.get(depth, self.max_tokens)
+                + self.analogy_adjustments.get(analogy, 0)
+            )
+
+        with self._lock:
+            observed = sorted(self._observed.get(key, ()))
+            truncations = self._truncations.get(key, 0)
+
+        if len(observed) < Config.GEMINI_TOKEN_MIN_SAMPLES:
+            budget = static_budget
+        else:
+            # Cover the 95th percentile of what this combination actually produced
+            p95 = observed[min(len(observed) - 1, int(len(observed) * 0.95))]
+            budget = int(p95 * self.headroom)
+
+        # Each recent truncation widens the budget so answers stop getting cut off
+        budget = int(budget * (1 + 0.25 * truncations))
+
+        return max(self.min_tokens, min(self.max_tokens, budget))
+
+    def record(self, depth: str, analogy: str, usage: Dict[str, Any], truncated: bool,
+               sections: Optional[Sequence[str]] = None):
+        """Record token usage reported by Gemini for a completed request."""
+        key = self._key(depth, analogy, sections)
+        candidate_tokens = usage.get('candidate_tokens') or 0
+
+        with self._lock:
+            history = self._observed.setdefault(key, deque(maxlen=self.window))
+            # A truncated answer says nothing about how long it wanted to be
+            if candidate_tokens and not truncated:
+                history.append(candidate_tokens)
+
+            # A reply that only fit after a retry at the ceiling also means the budget was short
+            if truncated or usage.get('retried_after_truncation'):
+                self._truncations[key] = min(self._truncations.get(key, 0) + 1, 4)
+            elif key in self._truncations:
+                self._truncations[key] = max(self._truncations[key] - 1, 0)
+
+            self._totals['requests'] += 1
+            self._totals['prompt_tokens'] += usage.get('prompt_tokens') or 0
+            self._totals['candidate_tokens'] += candidate_tokens
+            self._last_usage = dict(usage)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Summarize usage and the current budget for each observed combination."""
+        with self._lock:
+            keys = list(self._observed)
+            totals = dict(self._totals)
+            last_usage = dict(self._last_usage) if self._last_usage else None
+            samples = {key: len(self._observed[key]) for key in keys}
+
+        return {
+            'totals': totals,
+            'last_request': last_usage,
+            'budgets': {
+                '/'.join(key[:2]) + (f"/{'+'.join(key[2])}" if key[2] else ''): {
+                    'max_output_tokens': self.budget_for(*key),
+                    'samples': samples[key]
+                }
+                for key in keys
+            }
+        }
+
+    def _key(self, depth: str, analogy: str, sections: Optional[Sequence[str]]) -> tuple:
+        # Unknown levels share one slot so arbitrary input can't grow the tracked keys
+        if depth not in self.base_budgets:
+            depth = 'other'
+        if analogy not in self.analogy_adjustments:
+            analogy = 'other'
+        # Partial regenerations are tracked apart so they don't shrink full budgets
+        return (depth, analogy, tuple(sections) if sections else None)
@@ -0,0 +1,13 @@
+from typing import Optional
+from config import Config
+
+DEPTH_LEVELS = tuple(Config.GEMINI_TOKEN_BUDGETS)
+ANALOGY_LEVELS = tuple(Config.GEMINI_ANALOGY_TOKEN_ADJUSTMENTS)
+
+def validate_levels(depth: str, analogy: str) -> Optional[str]:
+    """Return an error message for an unknown depth or analogy level, else None."""
+    if depth not in DEPTH_LEVELS:
+        return f"Depth must be one of: {', '.join(DEPTH_LEVELS)}"
+    if analogy not in ANALOGY_LEVELS:
+        return f"Analogy must be one of: {', '.join(ANALOGY_LEVELS)}"
+    return None
@@ -14,8 +14,44 @@ class Config:
     GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
     GEMINI_BASE_URL = 'https://generativelanguage.googleapis.com/v1beta'
     GEMINI_MODEL = 'gemini-1.5-flash'  # Or 'gemini-1.5-pro' if you have access
+    GEMINI_REQUEST_TIMEOUT = 30  # seconds
+    
+    # Model routing: fast model by default, slow model for these depth levels
+    GEMINI_FAST_MODEL = GEMINI_MODEL
+    GEMINI_SLOW_MODEL = 'gemini-1.5-pro'
+    GEMINI_SLOW_MODEL_DEPTHS = ['advanced']
+    GEMINI_ROUTER_WINDOW = 100  # Recent calls kept per model
+    GEMINI_ROUTER_MIN_SAMPLES = 10  # Calls needed before stats influence routing
+    GEMINI_ROUTER_SAMPLE_TTL = 300  # seconds; older calls no longer influence routing
+    GEMINI_ROUTER_MAX_ERROR_RATE = 0.5
+    GEMINI_ROUTER_MAX_P95_LATENCY = 20  # seconds
+    GEMINI_HEDGE_PERCENTILE = 0.95  # Hedge to the other model after this latency percentile
     GEMINI_TEMPERATURE = 0.7
-    GEMINI_MAX_OUTPUT_TOKENS = 1024
+    GEMINI_MAX_OUTPUT_TOKENS = 1024  # Hard ceiling for any single request
+    GEMINI_MIN_OUTPUT_TOKENS = 256
+    
+    # Starting output budgets before enough lengths have been observed
+    GEMINI_TOKEN_BUDGETS = {
+        'beginner': 512,
+        'intermediate': 768,
+        'advanced': 1024
+    }
+    GEMINI_ANALOGY_TOKEN_ADJUSTMENTS = {
+        'none': -128,
+        'simple': 0,
+        'moderate': 0,
+        'complex': 128
+    }
+    # Starting budgets per section when only some sections are regenerated
+    GEMINI_SECTION_TOKEN_BUDGETS = {
+        'introduction': 128,
+        'core_concepts': 512,
+        'analogy': 256,
+        'summary': 192
+    }
+    GEMINI_TOKEN_HEADROOM = 1.2  # Multiplier over the observed p95 output length
+    GEMINI_TOKEN_HISTORY_SIZE = 50  # Output lengths kept per (depth, analogy)
+    GEMINI_TOKEN_MIN_SAMPLES = 5  # Observations needed before adapting
     
     # Image API Configurations
     SHUTTERSTOCK_CONSUMER_KEY = os.environ.get('SHUTTERSTOCK_CONSUMER_KEY')
@@ -30,5 +66,27 @@ class Config:
     
     WIKIMEDIA_BASE_URL = 'https://commons.wikimedia.org/w/api.php'
     
+    # One search request per provider; ranking picks the best of the results
+    IMAGE_SEARCH_TERMS = 1
+    IMAGE_SEARCH_PER_PAGE = 5
+    THUMBNAIL_HASH_DEADLINE = 2  # seconds for all thumbnail downloads of one fetch
+    
+    # Admission control
+    RATE_LIMIT_STORAGE_URL = os.environ.get('RATE_LIMIT_STORAGE_URL') or 'memory://'  # Or redis://host:6379/0
+    # Known integration keys; other X-API-Key values are ignored and the client IP is used
+    API_KEYS = {key.strip() for key in os.environ.get('API_KEYS', '').split(',') if key.strip()}
+    RATE_LIMIT_PER_SECOND = float(os.environ.get('RATE_LIMIT_PER_SECOND', 0.5))  # Tokens refilled per client per second
+    RATE_LIMIT_BURST = int(os.environ.get('RATE_LIMIT_BURST', 10))
+    # Reverse proxies in front of the app; their X-Forwarded-For entries identify the client
+    PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR', 0))
+    UPSTREAM_MAX_CONCURRENCY = 8  # Upstream-bound requests in flight per worker
+    # Each admitted request may run a primary plus a hedge or fallback Gemini call,
+    # and a losing hedge keeps its thread until its HTTP call returns
+    GEMINI_EXECUTOR_WORKERS = 2 * UPSTREAM_MAX_CONCURRENCY
+    UPSTREAM_QUEUE_SIZE = 16
+    UPSTREAM_QUEUE_TIMEOUT = 5  # seconds
+    
     # Caching
     DIAGRAM_CACHE_DURATION = 3600  # 1 hour in seconds
+    EXPLANATION_CACHE_DURATION = 86400  # 24 hours in seconds
+    EXPLANATION_CACHE_MAX_ENTRIES = 1000
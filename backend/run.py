@@ -24,6 +24,7 @@ def main():
         print("\n📡 Available Endpoints:")
         print("  GET  /api/health                 - Health check")
         print("  POST /api/explain                - Generate explanations")
+        print("  POST /api/explain/sections       - Regenerate selected sections")
         print("  GET  /api/topics/search          - Search topics")
         print("  GET  /api/image-sources/status   - Image sources status")
         print("  GET  /api/model/info             - AI model information")
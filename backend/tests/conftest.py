@@ -0,0 +1,35 @@
+import pytest
+from app import create_app
+from app import routes
+from config import Config
+
+class StubExplanationService:
+    """Stands in for Gemini: sleeps for a fixed upstream latency and returns a canned answer."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    def generate_explanation(self, topic, depth, analogy):
+        if self.latency:
+            import time
+            time.sleep(self.latency)
+        return {'introduction': topic, 'core_concepts': '', 'analogy': '', 'summary': [], 'usage': None}
+
+class StubImageService:
+    def get_diagrams_for_topic(self, topic_name):
+        return []
+
+@pytest.fixture
+def make_app(monkeypatch):
+    """Build an app on an in-memory database with config overrides and stubbed upstreams."""
+    def factory(latency: float = 0.0, **overrides):
+        config = type('TestConfig', (Config,), {
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+            'RATE_LIMIT_STORAGE_URL': 'memory://',
+            **overrides
+        })
+        monkeypatch.setattr(routes, 'explanation_service', StubExplanationService(latency))
+        monkeypatch.setattr(routes, 'image_service', StubImageService())
+        return create_app(config)
+    return factory
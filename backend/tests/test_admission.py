@@ -0,0 +1,105 @@
+import threading
+import time
+
+EXPLAIN_BODY = {'topic': 'Photosynthesis', 'depth': 'beginner', 'analogy': 'simple'}
+
+def test_rate_limit_returns_429_with_retry_after(make_app):
+    client = make_app(RATE_LIMIT_BURST=2, RATE_LIMIT_PER_SECOND=0.01).test_client()
+
+    assert client.get('/api/topics/search?q=cell').status_code == 200
+    assert client.get('/api/topics/search?q=cell').status_code == 200
+    response = client.get('/api/topics/search?q=cell')
+
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    assert response.json['success'] is False
+
+def test_unknown_api_keys_share_the_ip_bucket(make_app):
+    client = make_app(RATE_LIMIT_BURST=1, RATE_LIMIT_PER_SECOND=0.01, API_KEYS={'lms-1'}).test_client()
+
+    assert client.get('/api/topics/search', headers={'X-API-Key': 'random-1'}).status_code == 200
+    assert client.get('/api/topics/search', headers={'X-API-Key': 'random-2'}).status_code == 429
+    # A configured integration key gets a bucket of its own
+    assert client.get('/api/topics/search', headers={'X-API-Key': 'lms-1'}).status_code == 200
+
+def test_preflight_requests_are_not_rate_limited(make_app):
+    client = make_app(RATE_LIMIT_BURST=1, RATE_LIMIT_PER_SECOND=0.01).test_client()
+
+    for _ in range(5):
+        client.options('/api/explain')
+
+    assert client.post('/api/explain', json=EXPLAIN_BODY).status_code == 200
+
+def test_saturated_upstream_returns_503_with_retry_after(make_app):
+    app = make_app(latency=0.5, UPSTREAM_MAX_CONCURRENCY=1, UPSTREAM_QUEUE_SIZE=0)
+    holder = threading.Thread(target=lambda: app.test_client().post('/api/explain', json=EXPLAIN_BODY))
+    holder.start()
+    time.sleep(0.1)
+
+    response = app.test_client().post('/api/explain', json=EXPLAIN_BODY)
+    holder.join()
+
+    assert response.status_code == 503
+    assert int(response.headers['Retry-After']) >= 1
+
+def _run_load(app, clients: int, duration: float):
+    """Hammer /api/explain from `clients` threads; return (goodput per second, statuses)."""
+    statuses = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker():
+        client = app.test_client()
+        while time.monotonic() < deadline:
+            response = client.post('/api/explain', json=EXPLAIN_BODY)
+            with lock:
+                statuses.append((response.status_code, response.headers.get('Retry-After')))
+            if response.status_code != 200:
+                time.sleep(0.1)  # Back off, as a client honoring Retry-After would
+
+    threads = [threading.Thread(target=worker) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    goodput = sum(1 for status, _ in statuses if status == 200) / duration
+    return goodput, statuses
+
+def test_goodput_stays_flat_under_overload(make_app):
+    app = make_app(
+        latency=0.05,
+        RATE_LIMIT_BURST=10 ** 6,
+        RATE_LIMIT_PER_SECOND=10 ** 6,
+        UPSTREAM_MAX_CONCURRENCY=4,
+        UPSTREAM_QUEUE_SIZE=4,
+        UPSTREAM_QUEUE_TIMEOUT=0.05
+    )
+
+    results = {clients: _run_load(app, clients, duration=1.0) for clients in (4, 16, 64)}
+    baseline = results[4][0]
+
+    for clients, (goodput, statuses) in results.items():
+        assert goodput >= 0.7 * baseline, f'goodput fell to {goodput:.0f}/s at {clients} clients'
+        # Anything not served is shed fast with a 503 and a Retry-After hint
+        assert all(status == 200 or (status == 503 and retry_after) for status, retry_after in statuses)
+
+    overloaded = results[64][1]
+    assert any(status == 503 for status, _ in overloaded)
+
+def test_forwarded_clients_get_their_own_bucket_behind_a_proxy(make_app):
+    client = make_app(RATE_LIMIT_BURST=1, RATE_LIMIT_PER_SECOND=0.01, PROXY_FIX_X_FOR=1).test_client()
+
+    first = client.get('/api/topics/search', headers={'X-Forwarded-For': '10.0.0.1'})
+    second = client.get('/api/topics/search', headers={'X-Forwarded-For': '10.0.0.2'})
+    repeat = client.get('/api/topics/search', headers={'X-Forwarded-For': '10.0.0.1'})
+
+    assert (first.status_code, second.status_code, repeat.status_code) == (200, 200, 429)
+
+def test_forwarded_header_is_ignored_without_a_configured_proxy(make_app):
+    client = make_app(RATE_LIMIT_BURST=1, RATE_LIMIT_PER_SECOND=0.01).test_client()
+
+    client.get('/api/topics/search', headers={'X-Forwarded-For': '10.0.0.1'})
+    spoofed = client.get('/api/topics/search', headers={'X-Forwarded-For': '10.0.0.2'})
+
+    assert spoofed.status_code == 429
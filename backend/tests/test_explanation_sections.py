@@ -0,0 +1,97 @@
+import pytest
+from app.services import explanation_service as module
+from app.services.explanation_service import ExplanationService
+
+FULL_REPLY = "INTRODUCTION: intro\nCORE CONCEPTS: concepts\nANALOGY: analogy\nSUMMARY:\n- point"
+
+class FakeResponse:
+    def __init__(self, text, finish_reason='STOP'):
+        self.body = {
+            'candidates': [{'content': {'parts': [{'text': text}]}, 'finishReason': finish_reason}],
+            'usageMetadata': {'promptTokenCount': 10, 'candidatesTokenCount': 20}
+        }
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.body
+
+@pytest.fixture
+def service(make_app, monkeypatch):
+    replies = []
+    monkeypatch.setattr(module.requests, 'post', lambda *args, **kwargs: replies.pop(0))
+    service = ExplanationService()
+    service.replies = replies
+    with make_app().app_context():
+        yield service
+
+def test_regenerates_only_requested_section(service):
+    service.replies.append(FakeResponse(FULL_REPLY))
+    service.generate_explanation('DNA', 'beginner', 'simple')
+
+    service.replies.append(FakeResponse("ANALOGY: new analogy"))
+    result = service.regenerate_sections('DNA', 'beginner', 'complex', ['analogy'])
+
+    assert result['analogy'] == 'new analogy'
+    assert result['introduction'] == 'intro'
+    assert result['usage']['regenerated'] == ['analogy']
+
+def test_missing_section_keeps_previous_cached_value(service):
+    service.replies.append(FakeResponse(FULL_REPLY))
+    service.generate_explanation('DNA', 'beginner', 'simple')
+
+    service.replies.append(FakeResponse("ANALOGY: new analogy"))
+    result = service.regenerate_sections('DNA', 'beginner', 'simple', ['analogy', 'summary'])
+
+    assert result['summary'] == ['point']
+    assert result['usage']['regenerated'] == ['analogy']
+
+def test_missing_section_without_cache_fails(service):
+    service.replies.append(FakeResponse("ANALOGY: only analogy"))
+
+    with pytest.raises(RuntimeError):
+        service.regenerate_sections('DNA', 'beginner', 'simple', ['analogy', 'summary'])
+
+def test_truncated_reply_is_not_cached(service):
+    service.replies.append(FakeResponse(FULL_REPLY))
+    service.generate_explanation('DNA', 'beginner', 'simple')
+
+    # Still cut off after the retry at the ceiling
+    service.replies.extend([FakeResponse("ANALOGY: cut of", finish_reason='MAX_TOKENS')] * 2)
+    truncated = service.regenerate_sections('DNA', 'beginner', 'simple', ['analogy'])
+    assert truncated['analogy'] == 'cut of'
+
+    # The earlier good analogy is still what the cache serves
+    service.replies.append(FakeResponse("SUMMARY:\n- new point"))
+    reused = service.regenerate_sections('DNA', 'beginner', 'simple', ['summary'])
+    assert reused['analogy'] == 'analogy'
+
+def test_truncated_reply_is_retried_at_the_ceiling(service, monkeypatch):
+    budgets = []
+    replies = [FakeResponse("INTRODUCTION: cut", finish_reason='MAX_TOKENS'), FakeResponse(FULL_REPLY)]
+
+    def post(*args, json=None, **kwargs):
+        budgets.append(json['generationConfig']['maxOutputTokens'])
+        return replies.pop(0)
+    monkeypatch.setattr(module.requests, 'post', post)
+
+    result = service.generate_explanation('DNA', 'beginner', 'simple')
+
+    assert budgets == [512, module.Config.GEMINI_MAX_OUTPUT_TOKENS]
+    assert result['summary'] == ['point']
+    assert result['usage']['retried_after_truncation'] is True
+
+def test_sections_survive_a_fresh_process(service):
+    service.replies.append(FakeResponse(FULL_REPLY))
+    service.generate_explanation('DNA', 'beginner', 'simple')
+
+    # A new service has an empty LRU and must read the stored sections back
+    fresh = ExplanationService()
+    fresh.replies = service.replies
+    fresh.replies.append(FakeResponse("ANALOGY: newer analogy"))
+    result = fresh.regenerate_sections('DNA', 'beginner', 'simple', ['analogy'])
+
+    assert result['introduction'] == 'intro'
+    assert result['analogy'] == 'newer analogy'
+    assert result['usage']['regenerated'] == ['analogy']
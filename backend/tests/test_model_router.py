@@ -0,0 +1,91 @@
+import time
+import pytest
+import requests
+from app.services import explanation_service as module
+from app.services.explanation_service import ExplanationService
+from test_explanation_sections import FakeResponse, FULL_REPLY
+
+class FailingResponse:
+    def raise_for_status(self):
+        raise requests.exceptions.HTTPError('503 Service Unavailable')
+
+@pytest.fixture
+def service(make_app, monkeypatch):
+    """Service whose Gemini calls follow per-model behaviours set in `service.behaviour`."""
+    service = ExplanationService()
+    service.behaviour = {}
+
+    def post(url, *args, **kwargs):
+        model = url.split('/models/')[1].split(':')[0]
+        delay, response = service.behaviour.get(model, (0, FakeResponse(FULL_REPLY)))
+        time.sleep(delay)
+        return response
+    monkeypatch.setattr(module.requests, 'post', post)
+    with make_app().app_context():
+        yield service
+
+def test_falls_back_to_the_other_model_on_error(service):
+    service.behaviour[service.router.fast_model] = (0, FailingResponse())
+
+    result = service.generate_explanation('DNA', 'beginner', 'simple')
+
+    assert result['usage']['model'] == service.router.slow_model
+    assert service.router.get_stats()['decisions'][f'{service.router.slow_model}:fallback'] == 1
+
+def test_degraded_primary_is_swapped_out(service):
+    router = service.router
+    for _ in range(10):
+        router.record_result(router.fast_model, 0.1, success=False)
+
+    assert router.route('beginner') == [router.slow_model, router.fast_model]
+
+def test_degraded_model_recovers_once_samples_expire(service):
+    router = service.router
+    router.sample_ttl = 0.05
+    for _ in range(10):
+        router.record_result(router.fast_model, 0.1, success=False)
+    time.sleep(0.1)
+
+    assert router.route('beginner')[0] == router.fast_model
+    assert router.get_stats()['models'][router.fast_model]['requests'] == 0
+
+def test_slow_primary_is_hedged(service):
+    router = service.router
+    for _ in range(10):
+        router.record_result(router.fast_model, 0.01, success=True)
+    service.behaviour[router.fast_model] = (1.0, FakeResponse(FULL_REPLY))
+
+    start = time.monotonic()
+    result = service.generate_explanation('DNA', 'beginner', 'simple')
+
+    assert result['usage']['model'] == router.slow_model
+    assert time.monotonic() - start < 0.5
+    assert router.get_stats()['decisions'][f'{router.slow_model}:hedge'] == 1
+
+def test_cached_answer_is_served_when_every_model_fails(service):
+    service.generate_explanation('DNA', 'beginner', 'simple')
+    service.behaviour[service.router.fast_model] = (0, FailingResponse())
+    service.behaviour[service.router.slow_model] = (0, FailingResponse())
+
+    result = service.generate_explanation('DNA', 'beginner', 'simple')
+
+    assert result['usage']['source'] == 'cache'
+    assert result['summary'] == ['point']
+
+def test_failure_without_cache_raises(service):
+    service.behaviour[service.router.fast_model] = (0, FailingResponse())
+    service.behaviour[service.router.slow_model] = (0, FailingResponse())
+
+    with pytest.raises(RuntimeError):
+        service.generate_explanation('DNA', 'beginner', 'simple')
+
+def test_latency_histogram_covers_the_routing_window(service):
+    router = service.router
+    router.record_result(router.fast_model, 0.2, success=True)
+    router.record_result(router.fast_model, 3, success=True)
+
+    histogram = router.get_stats()['models'][router.fast_model]['latency_histogram']
+
+    assert histogram['<=0.5s'] == 1
+    assert histogram['<=5s'] == 1
+    assert sum(histogram.values()) == 2
@@ -0,0 +1,71 @@
+from app.services.ranking_service import DiagramRanker
+
+def _diagram(image_url, source='unsplash', **metadata):
+    return {'source': source, 'image_url': image_url, 'thumbnail_url': f'{image_url}?w=200', 'metadata': metadata}
+
+def test_keyword_overlap_orders_candidates_from_one_provider():
+    diagrams = [
+        _diagram('https://img/1', source='pixabay', id=1, tags=['sunset', 'beach']),
+        _diagram('https://img/2', source='pixabay', id=2, tags=['cell', 'division', 'mitosis'])
+    ]
+
+    ranked = DiagramRanker().rank('Mitosis cell division', diagrams)
+
+    assert [d['image_url'] for d in ranked] == ['https://img/2', 'https://img/1']
+
+def test_description_is_used_when_there_are_no_keywords():
+    diagrams = [
+        _diagram('https://img/1', id='a', description='person typing on a laptop'),
+        _diagram('https://img/2', id='b', description='green plant leaf photosynthesis diagram')
+    ]
+
+    ranked = DiagramRanker().rank('Photosynthesis', diagrams)
+
+    assert ranked[0]['image_url'] == 'https://img/2'
+
+def test_alt_text_is_the_last_resort():
+    diagrams = [
+        {**_diagram('https://img/1', id='a'), 'alt_text': 'city skyline at night'},
+        {**_diagram('https://img/2', id='b'), 'alt_text': 'water cycle evaporation'}
+    ]
+
+    ranked = DiagramRanker().rank('Water cycle', diagrams)
+
+    assert ranked[0]['image_url'] == 'https://img/2'
+
+def test_repeated_provider_id_and_url_are_dropped():
+    diagrams = [
+        _diagram('https://img/1', id=1),
+        _diagram('https://img/1?utm=x', id=2),
+        _diagram('https://img/3', id=1),
+        _diagram('https://img/4', id=4)
+    ]
+
+    unique = DiagramRanker().dedupe(diagrams)
+
+    assert [d['image_url'] for d in unique] == ['https://img/1', 'https://img/4']
+
+def test_near_duplicate_thumbnails_are_skipped():
+    diagrams = [
+        _diagram('https://img/1', id=1, thumbnail_hash='00000000000000ff'),
+        _diagram('https://img/2', id=2, thumbnail_hash='00000000000000fe'),
+        _diagram('https://img/3', id=3, thumbnail_hash='ffffffffffffff00')
+    ]
+
+    ranked = DiagramRanker().rank('anything', diagrams)
+
+    assert [d['image_url'] for d in ranked] == ['https://img/1', 'https://img/3']
+
+def test_only_top_candidates_are_hashed(monkeypatch):
+    from app.services import ranking_service
+    monkeypatch.setattr(ranking_service, 'Image', object())
+    ranker = DiagramRanker()
+    fetched = []
+    monkeypatch.setattr(ranker, '_thumbnail_hash', lambda url: fetched.append(url) or 1)
+    diagrams = [_diagram(f'https://img/{i}', id=i, tags=['mitosis'] if i >= 3 else []) for i in range(8)]
+
+    ranker.add_thumbnail_hashes('Mitosis', diagrams)
+
+    assert sorted(fetched) == sorted(f'https://img/{i}?w=200' for i in range(3, 7))
+    assert diagrams[3]['metadata']['thumbnail_hash'] == '0000000000000001'
+    assert 'thumbnail_hash' not in diagrams[0]['metadata']
@@ -0,0 +1,66 @@
+import json
+from datetime import datetime, timedelta
+from app.models import Topic, CachedDiagram, CachedExplanation, db
+from app.services.snapshot_service import SnapshotService
+
+def _seed(app):
+    with app.app_context():
+        topic = Topic(name='Mitosis', category='general')
+        db.session.add(topic)
+        db.session.flush()
+        db.session.add(CachedDiagram(
+            topic_id=topic.id,
+            source='wikimedia',
+            image_url='https://example.org/mitosis.png',
+            diagram_metadata=json.dumps({'title': 'File:Mitosis.png'}),
+            expires_at=datetime.utcnow() - timedelta(hours=2)
+        ))
+        db.session.add(CachedExplanation(
+            topic='mitosis',
+            depth='beginner',
+            analogy='',
+            section='introduction',
+            payload=json.dumps('Cells divide.'),
+            expires_at=datetime.utcnow() - timedelta(hours=2)
+        ))
+        db.session.commit()
+
+def test_round_trip_renews_diagram_expiry(make_app, tmp_path):
+    source, target = make_app(), make_app()
+    _seed(source)
+    path = str(tmp_path / 'snapshot.jsonl.gz')
+
+    with source.app_context():
+        counts = SnapshotService().export_snapshot(path)
+    assert counts == {'topics': 1, 'cached_diagrams': 1, 'cached_explanations': 1}
+
+    with target.app_context():
+        SnapshotService().import_snapshot(path)
+        diagram = CachedDiagram.query.one()
+        assert diagram.topic.name == 'Mitosis'
+        assert diagram.expires_at > datetime.utcnow()
+        explanation = CachedExplanation.query.one()
+        assert json.loads(explanation.payload) == 'Cells divide.'
+        assert explanation.expires_at > datetime.utcnow()
+
+def test_keep_expiry_preserves_exported_times(make_app, tmp_path):
+    source, target = make_app(), make_app()
+    _seed(source)
+    path = str(tmp_path / 'snapshot.jsonl.gz')
+
+    with source.app_context():
+        SnapshotService().export_snapshot(path)
+
+    with target.app_context():
+        SnapshotService().import_snapshot(path, keep_expiry=True)
+        assert CachedDiagram.query.one().expires_at < datetime.utcnow()
+        assert CachedExplanation.query.one().expires_at < datetime.utcnow()
+
+def test_cli_rejects_a_file_that_is_not_a_snapshot(make_app, tmp_path):
+    path = tmp_path / 'snapshot.jsonl.gz'
+    path.write_text('not gzip')
+
+    result = make_app().test_cli_runner().invoke(args=['snapshot', 'import', str(path)])
+    assert result.exit_code == 1
+    assert 'Error:' in result.output
+    assert result.exception is None or isinstance(result.exception, SystemExit)
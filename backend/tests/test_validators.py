@@ -0,0 +1,21 @@
+from app.services.token_budget import TokenBudget
+from app.utils.validators import validate_levels
+
+def test_known_levels_pass():
+    assert validate_levels('beginner', 'none') is None
+
+def test_unknown_levels_are_rejected_by_the_api(make_app):
+    client = make_app().test_client()
+
+    depth = client.post('/api/explain', json={'topic': 'DNA', 'depth': 'expert'})
+    analogy = client.post('/api/explain/sections', json={'topic': 'DNA', 'analogy': 'x', 'sections': ['analogy']})
+
+    assert depth.status_code == 400
+    assert analogy.status_code == 400
+
+def test_token_budget_folds_unknown_levels_into_one_key():
+    budget = TokenBudget()
+    for index in range(50):
+        budget.record(f'depth-{index}', f'analogy-{index}', {'candidate_tokens': 100}, truncated=False)
+
+    assert list(budget.get_stats()['budgets']) == ['other/other']
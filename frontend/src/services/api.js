@@ -18,6 +18,17 @@ export const academicAPI = {
     return response.data;
   },
 
+  // Regenerate only some sections, e.g. ['analogy'] after an analogy level change
+  regenerateSections: async (topic, depth, analogy, sections) => {
+    const response = await api.post('/explain/sections', {
+      topic,
+      depth,
+      analogy,
+      sections
+    });
+    return response.data;
+  },
+
   // Search topics
   searchTopics: async (query, limit = 10) => {
     const response = await api.get('/topics/search', {